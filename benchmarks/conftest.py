@@ -0,0 +1,170 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import pytest
+
+# Make the application modules importable when running plain `pytest`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+# Allowed relative regression before a benchmark fails, e.g. 0.25 = 25%
+THRESHOLD_ENV = "TICKSCRIBE_BENCH_THRESHOLD"
+DEFAULT_THRESHOLD = 0.25
+# Absolute allowance on peak memory, so benchmarks that stream in a few KiB
+# don't fail on interpreter noise while buffering whole inputs still does
+MEMORY_SLACK_BYTES = 64 * 1024
+# Minimum duration of a timing round, fast functions are repeated until
+# they reach it so timer resolution and scheduling jitter average out
+MIN_ROUND_SECONDS = 0.02
+
+_results = {}
+
+
+def calibration_loop():
+    """Fixed pure-Python workload measuring the speed of this machine, so
+    throughput can be compared across machines"""
+    total = 0
+    parts = []
+    for i in range(20_000):
+        total += i * i % 7
+        if i % 100 == 0:
+            parts.append(str(total))
+    return "".join(parts)
+
+
+def best_time(func, *args, loops=1, **kwargs):
+    """Return the average duration of `loops` consecutive calls"""
+    start = time.perf_counter()
+    for _ in range(loops):
+        func(*args, **kwargs)
+    return (time.perf_counter() - start) / loops
+
+
+def loops_for(func, *args, **kwargs):
+    """Number of calls needed for a round to last MIN_ROUND_SECONDS"""
+    duration = best_time(func, *args, **kwargs)
+    if duration <= 0:
+        return 1000
+    return max(1, int(MIN_ROUND_SECONDS / duration) + 1)
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--update-baselines",
+        action="store_true",
+        default=False,
+        help="Store the benchmark results as the new baselines",
+    )
+
+
+def load_baselines():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class BenchmarkRunner:
+    def __init__(self, baselines, update, threshold):
+        self.baselines = baselines
+        self.update = update
+        self.threshold = threshold
+
+    def __call__(self, name, func, *args, rounds=10, threshold=None, **kwargs):
+        """Time `func` and measure its peak memory, then compare the result
+        with the stored baseline of the same name.
+
+        `threshold` overrides the allowed regression for this benchmark.
+        """
+        if threshold is None:
+            threshold = self.threshold
+        # Warm up caches and lazily compiled regexes
+        func(*args, **kwargs)
+        loops = loops_for(func, *args, **kwargs)
+        calibration_loops = loops_for(calibration_loop)
+
+        # Interleave calibration rounds so both see the same machine load
+        best = calibration_best = float("inf")
+        for _ in range(rounds):
+            calibration_best = min(
+                calibration_best,
+                best_time(calibration_loop, loops=calibration_loops))
+            best = min(best, best_time(func, *args, loops=loops, **kwargs))
+
+        # Measure memory in a separate run, tracing slows execution down
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        ops_per_sec = 1 / best if best > 0 else float("inf")
+        result = {
+            "ops_per_sec": ops_per_sec,
+            # Throughput relative to the calibration loop, comparable
+            # between machines of different speed
+            "relative_throughput": ops_per_sec * calibration_best,
+            "peak_bytes": peak,
+        }
+        _results[name] = result
+
+        if self.update:
+            return result
+        baseline = self.baselines.get(name)
+        if baseline is None:
+            pytest.fail(
+                f"{name}: no baseline in {os.path.basename(BASELINE_PATH)}, "
+                "run with --update-baselines to record one"
+            )
+
+        min_relative = baseline["relative_throughput"] * (1 - threshold)
+        if result["relative_throughput"] < min_relative:
+            pytest.fail(
+                f"{name}: throughput regressed to "
+                f"{result['relative_throughput']:.6f} "
+                f"(baseline {baseline['relative_throughput']:.6f}, "
+                "relative to the calibration loop)"
+            )
+        max_peak = baseline["peak_bytes"] * (1 + threshold) + MEMORY_SLACK_BYTES
+        if result["peak_bytes"] > max_peak:
+            pytest.fail(
+                f"{name}: peak memory regressed to {result['peak_bytes']} bytes "
+                f"(baseline {baseline['peak_bytes']} bytes)"
+            )
+        return result
+
+
+@pytest.fixture(scope="session")
+def bench(request):
+    threshold = float(os.environ.get(THRESHOLD_ENV, DEFAULT_THRESHOLD))
+    return BenchmarkRunner(
+        load_baselines(),
+        request.config.getoption("--update-baselines"),
+        threshold,
+    )
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not _results or not session.config.getoption("--update-baselines"):
+        return
+    baselines = load_baselines()
+    baselines.update(_results)
+    with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    terminalreporter.section("benchmarks")
+    for name, result in sorted(_results.items()):
+        terminalreporter.write_line(
+            f"{name:<40} {result['ops_per_sec']:>12.2f} ops/s "
+            f"{result['relative_throughput']:>12.6f} relative "
+            f"{result['peak_bytes'] / 1024:>12.1f} KiB peak"
+        )
@@ -0,0 +1,61 @@
+import itertools
+
+import pytest
+
+from workloads import make_transcripts
+
+pytest.importorskip("PySide6")
+
+from PySide6.QtCore import QCoreApplication  # noqa: E402
+
+from database import Database  # noqa: E402
+
+ROWS = make_transcripts(2_000)
+# Session names must be unique across benchmark rounds
+_session_numbers = itertools.count()
+
+
+@pytest.fixture(scope="module")
+def app():
+    # The SQL driver plugins are loaded through the application instance,
+    # which must outlive every connection
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def db(app, tmp_path):
+    db = Database(str(tmp_path / "benchmark.db"), connection_name="benchmark")
+    yield db
+    db.close()
+
+
+def insert_rows(db):
+    session_id = db.create_session(f"session-{next(_session_numbers)}")
+    for row in ROWS:
+        db.add_transcript(session_id, row["text"])
+    return session_id
+
+
+def test_add_transcript(bench, db):
+    # Each insert commits to disk, which the CPU calibration cannot account
+    # for, so allow more variation
+    bench("database.add_transcript", insert_rows, db, rounds=3, threshold=0.6)
+
+
+def test_get_transcripts_by_session_id(bench, db):
+    session_id = insert_rows(db)
+    bench(
+        "database.get_transcripts_by_session_id",
+        db.get_transcripts_by_session_id,
+        session_id,
+    )
+
+
+def test_iter_transcripts(bench, db):
+    session_id = insert_rows(db)
+
+    def consume():
+        for _ in db.iter_transcripts(session_id):
+            pass
+
+    bench("database.iter_transcripts", consume)
@@ -0,0 +1,29 @@
+import pytest
+
+from exporters import EXPORTERS, create_exporter
+from workloads import make_transcripts
+
+ROWS = make_transcripts(20_000)
+SESSION = {"id": 1, "name": "Benchmark"}
+
+
+class CountingSink:
+    """Output file that discards its input, so the measured peak memory is
+    that of the exporter rather than of the accumulated output"""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+
+
+def export(fmt):
+    out = CountingSink()
+    create_exporter(fmt, out).write_session(SESSION, iter(ROWS))
+    return out.size
+
+
+@pytest.mark.parametrize("fmt", sorted(EXPORTERS))
+def test_export(bench, fmt):
+    bench(f"exporters.{fmt}", export, fmt)
@@ -0,0 +1,48 @@
+import pytest
+
+from workloads import make_chat, make_text
+
+pytest.importorskip("PySide6")
+
+from utils import (accumulate_token, build_llm_messages,  # noqa: E402
+                   clean_str, split_chat_history, split_sentences)
+
+TRANSCRIPTION = make_text(20_000)
+CHAT = make_chat(2_000)
+# LLM responses stream roughly one word per token
+TOKENS = [f"{word} " for word in make_text(2_000).split()]
+
+
+def test_clean_str(bench):
+    bench("utils.clean_str", clean_str, TRANSCRIPTION)
+
+
+def test_split_sentences(bench):
+    bench("utils.split_sentences", split_sentences, TRANSCRIPTION)
+
+
+def test_split_chat_history(bench):
+    bench("utils.split_chat_history", split_chat_history, CHAT, 1024)
+
+
+def test_build_llm_messages(bench):
+    summary = make_text(200)
+    bench(
+        "utils.build_llm_messages",
+        build_llm_messages,
+        TRANSCRIPTION,
+        summary,
+        CHAT,
+        1024,
+    )
+
+
+def stream_tokens(tokens):
+    partial_response = ''
+    for token in tokens:
+        partial_response, label = accumulate_token(partial_response, token)
+    return label
+
+
+def test_accumulate_token(bench):
+    bench("utils.accumulate_token", stream_tokens, TOKENS)
@@ -0,0 +1,57 @@
+import random
+from datetime import datetime, timedelta
+
+# Fixed seed so every run benchmarks the same synthetic data
+SEED = 1234
+
+WORDS = (
+    "the meeting starts at nine and we will review the quarterly numbers "
+    "before discussing the roadmap shit happens sometimes so keep notes"
+).split()
+
+
+def make_text(word_count, seed=SEED):
+    rng = random.Random(seed)
+    words = []
+    for i in range(word_count):
+        word = rng.choice(WORDS)
+        # End a sentence every few words, mixing Latin and CJK punctuation
+        if i % 12 == 11:
+            word += rng.choice([".", "?", "!", "。", "？"])
+        words.append(word)
+    return " ".join(words)
+
+
+def make_chat(message_count, seed=SEED):
+    rng = random.Random(seed)
+    messages = []
+    for i in range(message_count):
+        role = "user" if i % 2 == 0 else "assistant"
+        word_count = rng.randint(5, 20) if role == "user" else rng.randint(40, 200)
+        messages.append(
+            {
+                "id": i + 1,
+                "role": role,
+                "content": make_text(word_count, seed + i),
+                "token_count": word_count * 4 // 3,
+            }
+        )
+    return messages
+
+
+def make_transcripts(row_count, seed=SEED):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, 9, 0, 0)
+    elapsed = 0
+    rows = []
+    for i in range(row_count):
+        # File transcriptions store several rows within the same second
+        elapsed += rng.choice([0, 0, 1, 2, 5])
+        rows.append(
+            {
+                "id": i + 1,
+                "text": make_text(rng.randint(5, 25), seed + i),
+                "timestamp": (start + timedelta(seconds=elapsed)).isoformat(" "),
+            }
+        )
+    return rows
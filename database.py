@@ -1,28 +1,76 @@
+import json
+import zlib
+
+from PySide6.QtCore import QByteArray
 from PySide6.QtSql import QSqlDatabase, QSqlQuery
 
+# Value of PRAGMA auto_vacuum when incremental vacuum is enabled
+AUTO_VACUUM_INCREMENTAL = 2
+# Pages freed per transaction by incremental_vacuum(), so the write lock
+# is only held briefly
+VACUUM_CHUNK_PAGES = 256
+# Rows sampled per index by ANALYZE, bounding its run time on large files
+ANALYSIS_LIMIT = 1000
+
+
+class RestoreError(Exception):
+    pass
+
 
 class Database:
-    def __init__(self, db_path="transcripts.db"):
+    def __init__(self, db_path="transcripts.db", connection_name=None):
         self.db_path = db_path
-        self.db = QSqlDatabase.addDatabase("QSQLITE")
+        # Worker threads need their own named connection, since a Qt SQL
+        # connection may only be used from the thread that created it
+        if connection_name is None:
+            self.db = QSqlDatabase.addDatabase("QSQLITE")
+        else:
+            self.db = QSqlDatabase.addDatabase("QSQLITE", connection_name)
         self.db.setDatabaseName(self.db_path)
+        # Wait for locks held by other connections instead of failing
+        self.db.setConnectOptions("QSQLITE_BUSY_TIMEOUT=5000")
         if not self.db.open():
+            connection_name = self.db.connectionName()
+            self.db = None
+            QSqlDatabase.removeDatabase(connection_name)
             raise Exception("Failed to open database")
+        # SQLite leaves foreign keys off per connection unless asked, which
+        # would make ON DELETE CASCADE a no-op
+        QSqlQuery("PRAGMA foreign_keys = ON", self.db)
         self.init_db()
+        # In WAL mode long reads on worker connections (exports) do not
+        # block the GUI thread from saving transcripts. Switched after
+        # init_db() since auto_vacuum must be set before the file is written
+        QSqlQuery("PRAGMA journal_mode = WAL", self.db)
+
+    def close(self):
+        connection_name = self.db.connectionName()
+        self.db.close()
+        self.db = None
+        QSqlDatabase.removeDatabase(connection_name)
 
     def init_db(self):
-        query = QSqlQuery()
+        query = QSqlQuery(self.db)
+
+        # Only takes effect for new databases, existing ones are converted
+        # by enable_incremental_vacuum()
+        query.exec(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
 
         query.exec(
             """
             CREATE TABLE IF NOT EXISTS sessions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                restored_at TIMESTAMP
             )
             """
         )
 
+        # Databases created before archival lack the restored_at column
+        if "restored_at" not in self._table_columns("sessions"):
+            query.exec("ALTER TABLE sessions ADD COLUMN restored_at TIMESTAMP")
+
         query.exec(
             """
             CREATE TABLE IF NOT EXISTS transcripts (
@@ -35,10 +83,68 @@ class Database:
             """
         )
 
+        query.exec(
+            """
+            CREATE INDEX IF NOT EXISTS idx_transcripts_session
+            ON transcripts (session_id, timestamp)
+            """
+        )
+
+        query.exec(
+            """
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                token_count INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (session_id) REFERENCES sessions (id) ON DELETE CASCADE
+            )
+            """
+        )
+
+        query.exec(
+            """
+            CREATE INDEX IF NOT EXISTS idx_chat_messages_session
+            ON chat_messages (session_id, id)
+            """
+        )
+
+        query.exec(
+            """
+            CREATE TABLE IF NOT EXISTS chat_summaries (
+                session_id INTEGER PRIMARY KEY,
+                content TEXT NOT NULL,
+                summarized_until INTEGER NOT NULL,
+                FOREIGN KEY (session_id) REFERENCES sessions (id) ON DELETE CASCADE
+            )
+            """
+        )
+
+        query.exec(
+            """
+            CREATE TABLE IF NOT EXISTS archived_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                created_at TIMESTAMP,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                transcript_count INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                chat_data BLOB
+            )
+            """
+        )
+
+        # Archives created before chat history was archived lack chat_data
+        if "chat_data" not in self._table_columns("archived_sessions"):
+            query.exec("ALTER TABLE archived_sessions ADD COLUMN chat_data BLOB")
+
     def get_all_sessions(self):
         sessions = []
         query = QSqlQuery(
-            "SELECT id, name, created_at FROM sessions ORDER BY created_at DESC"
+            "SELECT id, name, created_at FROM sessions ORDER BY created_at DESC",
+            self.db,
         )
         while query.next():
             sessions.append(
@@ -51,7 +157,7 @@ class Database:
         return sessions
 
     def create_session(self, name):
-        query = QSqlQuery()
+        query = QSqlQuery(self.db)
         query.prepare("INSERT INTO sessions (name) VALUES (:name)")
         query.bindValue(":name", name)
         if not query.exec():
@@ -59,7 +165,7 @@ class Database:
         return query.lastInsertId()
 
     def get_session_id_by_name(self, name):
-        query = QSqlQuery()
+        query = QSqlQuery(self.db)
         query.prepare("SELECT id FROM sessions WHERE name = :name")
         query.bindValue(":name", name)
         query.exec()
@@ -68,7 +174,7 @@ class Database:
         return None
 
     def get_session_name_by_id(self, session_id):
-        query = QSqlQuery()
+        query = QSqlQuery(self.db)
         query.prepare("SELECT name FROM sessions WHERE id = :id")
         query.bindValue(":id", session_id)
         query.exec()
@@ -77,20 +183,20 @@ class Database:
         return None
 
     def delete_session(self, session_id):
-        query = QSqlQuery()
+        query = QSqlQuery(self.db)
         query.prepare("DELETE FROM sessions WHERE id = :id")
         query.bindValue(":id", session_id)
         query.exec()
 
     def rename_session(self, session_id, new_name):
-        query = QSqlQuery()
+        query = QSqlQuery(self.db)
         query.prepare("UPDATE sessions SET name = :name WHERE id = :id")
         query.bindValue(":name", new_name)
         query.bindValue(":id", session_id)
         return query.exec()
 
     def add_transcript(self, session_id, text):
-        query = QSqlQuery()
+        query = QSqlQuery(self.db)
         query.prepare(
             """
             INSERT INTO transcripts (session_id, text)
@@ -99,11 +205,13 @@ class Database:
         )
         query.bindValue(":session_id", session_id)
         query.bindValue(":text", text)
-        query.exec()
+        if not query.exec():
+            return None
+        return query.lastInsertId()
 
     def get_transcripts_by_session_id(self, session_id):
         transcripts = []
-        query = QSqlQuery()
+        query = QSqlQuery(self.db)
         query.prepare(
             """
             SELECT id, text, timestamp FROM transcripts
@@ -122,3 +230,454 @@ class Database:
                 }
             )
         return transcripts
+
+    def count_transcripts(self, session_id):
+        query = QSqlQuery(self.db)
+        query.prepare(
+            "SELECT COUNT(*) FROM transcripts WHERE session_id = :session_id"
+        )
+        query.bindValue(":session_id", session_id)
+        query.exec()
+        if query.next():
+            return query.value(0)
+        return 0
+
+    def iter_transcripts(self, session_id):
+        """Yield transcripts one at a time without buffering the result set"""
+        query = QSqlQuery(self.db)
+        # Forward-only queries step the SQLite cursor instead of caching rows
+        query.setForwardOnly(True)
+        query.prepare(
+            """
+            SELECT id, text, timestamp FROM transcripts
+            WHERE session_id = :session_id
+            ORDER BY timestamp, id
+        """
+        )
+        query.bindValue(":session_id", session_id)
+        query.exec()
+        try:
+            while query.next():
+                yield {
+                    "id": query.value(0),
+                    "text": query.value(1),
+                    "timestamp": query.value(2),
+                }
+        finally:
+            query.finish()
+
+    def add_chat_message(self, session_id, role, content, token_count=0):
+        query = QSqlQuery(self.db)
+        query.prepare(
+            """
+            INSERT INTO chat_messages (session_id, role, content, token_count)
+            VALUES (:session_id, :role, :content, :token_count)
+        """
+        )
+        query.bindValue(":session_id", session_id)
+        query.bindValue(":role", role)
+        query.bindValue(":content", content)
+        query.bindValue(":token_count", token_count)
+        if not query.exec():
+            return None
+        return query.lastInsertId()
+
+    def get_chat_messages(self, session_id):
+        messages = []
+        query = QSqlQuery(self.db)
+        query.setForwardOnly(True)
+        query.prepare(
+            """
+            SELECT id, role, content, token_count, created_at FROM chat_messages
+            WHERE session_id = :session_id
+            ORDER BY id
+        """
+        )
+        query.bindValue(":session_id", session_id)
+        query.exec()
+        while query.next():
+            messages.append(
+                {
+                    "id": query.value(0),
+                    "role": query.value(1),
+                    "content": query.value(2),
+                    "token_count": query.value(3),
+                    "created_at": query.value(4),
+                }
+            )
+        return messages
+
+    def get_chat_summary(self, session_id):
+        query = QSqlQuery(self.db)
+        query.prepare(
+            """
+            SELECT content, summarized_until FROM chat_summaries
+            WHERE session_id = :session_id
+        """
+        )
+        query.bindValue(":session_id", session_id)
+        query.exec()
+        if query.next():
+            return {
+                "content": query.value(0),
+                "summarized_until": query.value(1),
+            }
+        return None
+
+    def save_chat_summary(self, session_id, content, summarized_until):
+        """Store the running summary of all chat messages up to and
+        including `summarized_until`"""
+        query = QSqlQuery(self.db)
+        query.prepare(
+            """
+            INSERT OR REPLACE INTO chat_summaries
+                (session_id, content, summarized_until)
+            VALUES (:session_id, :content, :summarized_until)
+        """
+        )
+        query.bindValue(":session_id", session_id)
+        query.bindValue(":content", content)
+        query.bindValue(":summarized_until", summarized_until)
+        return query.exec()
+
+    def clear_chat(self, session_id):
+        query = QSqlQuery(self.db)
+        query.prepare("DELETE FROM chat_messages WHERE session_id = :session_id")
+        query.bindValue(":session_id", session_id)
+        query.exec()
+        query = QSqlQuery(self.db)
+        query.prepare("DELETE FROM chat_summaries WHERE session_id = :session_id")
+        query.bindValue(":session_id", session_id)
+        query.exec()
+
+    def _table_columns(self, table):
+        columns = []
+        query = QSqlQuery(f"PRAGMA table_info({table})", self.db)
+        while query.next():
+            columns.append(query.value(1))
+        return columns
+
+    def _pragma_value(self, pragma):
+        query = QSqlQuery(f"PRAGMA {pragma}", self.db)
+        if query.next():
+            return query.value(0)
+        return None
+
+    def is_incremental_vacuum_enabled(self):
+        return self._pragma_value("auto_vacuum") == AUTO_VACUUM_INCREMENTAL
+
+    def enable_incremental_vacuum(self):
+        """Convert the database to incremental auto-vacuum if needed.
+
+        This runs a full VACUUM, which locks the whole database for as long
+        as it takes to rewrite it. Returns True if the VACUUM was run.
+        """
+        if self.is_incremental_vacuum_enabled():
+            return False
+        query = QSqlQuery(self.db)
+        query.exec(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+        return query.exec("VACUUM")
+
+    def incremental_vacuum(self):
+        """Release every free page back to the file system"""
+        free_pages = self._pragma_value("freelist_count")
+        query = QSqlQuery(self.db)
+        query.prepare("PRAGMA incremental_vacuum")
+        # SQLite frees one page per step and Qt steps once per exec(). Commit
+        # every chunk so other connections can write in between
+        for chunk_start in range(0, free_pages, VACUUM_CHUNK_PAGES):
+            self.db.transaction()
+            for _ in range(min(VACUUM_CHUNK_PAGES, free_pages - chunk_start)):
+                if not query.exec():
+                    break
+            query.finish()
+            self.db.commit()
+
+    def analyze(self):
+        query = QSqlQuery(self.db)
+        query.exec(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        return query.exec("ANALYZE")
+
+    def purge_orphaned_transcripts(self):
+        """Delete transcripts whose session no longer exists"""
+        query = QSqlQuery(self.db)
+        query.exec(
+            """
+            DELETE FROM transcripts
+            WHERE session_id NOT IN (SELECT id FROM sessions)
+        """
+        )
+        return max(query.numRowsAffected(), 0)
+
+    def get_expired_session_ids(self, retention_days):
+        """Return sessions with no activity in the last `retention_days`"""
+        session_ids = []
+        query = QSqlQuery(self.db)
+        query.prepare(
+            """
+            SELECT s.id FROM sessions s
+            LEFT JOIN transcripts t ON t.session_id = s.id
+            GROUP BY s.id
+            HAVING MAX(
+                COALESCE(MAX(t.timestamp), s.created_at),
+                COALESCE(s.restored_at, s.created_at),
+                COALESCE(
+                    (SELECT MAX(c.created_at) FROM chat_messages c
+                     WHERE c.session_id = s.id),
+                    s.created_at
+                )
+            ) < datetime('now', :cutoff)
+        """
+        )
+        query.bindValue(":cutoff", f"-{int(retention_days)} days")
+        query.exec()
+        while query.next():
+            session_ids.append(query.value(0))
+        return session_ids
+
+    def archive_session(self, session_id):
+        """Move a session and its transcripts into a compressed archive row"""
+        query = QSqlQuery(self.db)
+        query.prepare("SELECT name, created_at FROM sessions WHERE id = :id")
+        query.bindValue(":id", session_id)
+        query.exec()
+        if not query.next():
+            return None
+        name, created_at = query.value(0), query.value(1)
+
+        # Compress the transcripts as JSON lines while streaming them
+        compressor = zlib.compressobj(9)
+        chunks = []
+        count = 0
+        for transcript in self.iter_transcripts(session_id):
+            line = json.dumps(
+                {
+                    "text": transcript["text"],
+                    "timestamp": str(transcript["timestamp"]),
+                },
+                ensure_ascii=False,
+            )
+            chunks.append(compressor.compress(line.encode("utf-8") + b"\n"))
+            count += 1
+        chunks.append(compressor.flush())
+
+        # Deleting the session cascades to its chat, so archive it as well
+        chat_data = self._compress_chat(session_id)
+
+        self.db.transaction()
+        query = QSqlQuery(self.db)
+        query.prepare(
+            """
+            INSERT INTO archived_sessions
+                (name, created_at, transcript_count, data, chat_data)
+            VALUES (:name, :created_at, :count, :data, :chat_data)
+        """
+        )
+        query.bindValue(":name", name)
+        query.bindValue(":created_at", created_at)
+        query.bindValue(":count", count)
+        query.bindValue(":data", QByteArray(b"".join(chunks)))
+        query.bindValue(":chat_data", QByteArray(chat_data))
+        if not query.exec():
+            self.db.rollback()
+            return None
+        archive_id = query.lastInsertId()
+
+        query = QSqlQuery(self.db)
+        query.prepare("DELETE FROM sessions WHERE id = :id")
+        query.bindValue(":id", session_id)
+        if not query.exec():
+            self.db.rollback()
+            return None
+        self.db.commit()
+        return archive_id
+
+    def _compress_chat(self, session_id):
+        """Serialize the chat messages and running summary of a session"""
+        messages = self.get_chat_messages(session_id)
+        summary = self.get_chat_summary(session_id)
+        chat = {
+            "messages": [
+                {
+                    "role": message["role"],
+                    "content": message["content"],
+                    "token_count": message["token_count"],
+                    "created_at": str(message["created_at"]),
+                }
+                for message in messages
+            ],
+            "summary": None,
+        }
+        if summary:
+            # Message ids change on restore, so store how many are folded
+            chat["summary"] = {
+                "content": summary["content"],
+                "summarized_count": sum(
+                    1 for message in messages
+                    if message["id"] <= summary["summarized_until"]
+                ),
+            }
+        return zlib.compress(
+            json.dumps(chat, ensure_ascii=False).encode("utf-8"), 9)
+
+    def _restore_chat(self, archive_id, session_id):
+        """Re-insert the archived chat of a session, returns False on failure"""
+        query = QSqlQuery(self.db)
+        query.prepare("SELECT chat_data FROM archived_sessions WHERE id = :id")
+        query.bindValue(":id", archive_id)
+        query.exec()
+        if not query.next() or query.isNull(0):
+            return True
+        chat = json.loads(zlib.decompress(bytes(query.value(0))))
+        query.finish()
+
+        query = QSqlQuery(self.db)
+        query.prepare(
+            """
+            INSERT INTO chat_messages
+                (session_id, role, content, token_count, created_at)
+            VALUES (:session_id, :role, :content, :token_count, :created_at)
+        """
+        )
+        message_ids = []
+        for message in chat["messages"]:
+            query.bindValue(":session_id", session_id)
+            query.bindValue(":role", message["role"])
+            query.bindValue(":content", message["content"])
+            query.bindValue(":token_count", message["token_count"])
+            query.bindValue(":created_at", message["created_at"])
+            if not query.exec():
+                return False
+            message_ids.append(query.lastInsertId())
+
+        summary = chat["summary"]
+        if summary:
+            count = summary["summarized_count"]
+            summarized_until = message_ids[count - 1] if count else 0
+            return self.save_chat_summary(
+                session_id, summary["content"], summarized_until)
+        return True
+
+    def get_archived_sessions(self):
+        sessions = []
+        query = QSqlQuery(
+            """
+            SELECT id, name, created_at, archived_at, transcript_count
+            FROM archived_sessions ORDER BY archived_at DESC
+            """,
+            self.db,
+        )
+        while query.next():
+            sessions.append(
+                {
+                    "id": query.value(0),
+                    "name": query.value(1),
+                    "created_at": query.value(2),
+                    "archived_at": query.value(3),
+                    "transcript_count": query.value(4),
+                }
+            )
+        return sessions
+
+    def iter_archived_transcripts(self, archive_id):
+        """Yield the transcripts of an archived session, decompressing
+        them on demand"""
+        query = QSqlQuery(self.db)
+        query.prepare("SELECT data FROM archived_sessions WHERE id = :id")
+        query.bindValue(":id", archive_id)
+        query.exec()
+        if not query.next():
+            return
+        data = bytes(query.value(0))
+        query.finish()
+
+        decompressor = zlib.decompressobj()
+        pending = b""
+        # Decompress in slices so only part of the text is held at a time
+        for start in range(0, len(data), 64 * 1024):
+            pending += decompressor.decompress(data[start:start + 64 * 1024])
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                yield json.loads(line)
+        pending += decompressor.flush()
+        if pending.strip():
+            yield json.loads(pending)
+
+    def restore_archived_session(self, archive_id):
+        """Move an archived session back into the live tables.
+
+        Returns the new session id, raises RestoreError on failure.
+        """
+        query = QSqlQuery(self.db)
+        query.prepare(
+            "SELECT name, created_at FROM archived_sessions WHERE id = :id"
+        )
+        query.bindValue(":id", archive_id)
+        query.exec()
+        if not query.next():
+            raise RestoreError("The archived session no longer exists.")
+        name, created_at = query.value(0), query.value(1)
+        query.finish()
+
+        if self.get_session_id_by_name(name) is not None:
+            raise RestoreError("A session with that name already exists.")
+
+        self.db.transaction()
+        try:
+            session_id = self._restore_session_rows(
+                archive_id, name, created_at)
+        except (ValueError, KeyError, IndexError, zlib.error):
+            self.db.rollback()
+            raise RestoreError("The archived data is corrupt.") from None
+        except RestoreError:
+            self.db.rollback()
+            raise
+
+        if not self.db.commit():
+            self.db.rollback()
+            raise RestoreError(
+                f"Failed to restore session: {self.db.lastError().text()}")
+        return session_id
+
+    def _restore_session_rows(self, archive_id, name, created_at):
+        """Re-insert an archived session, must run inside a transaction"""
+        query = QSqlQuery(self.db)
+        # Record the restore so retention does not archive it straight away
+        query.prepare(
+            """
+            INSERT INTO sessions (name, created_at, restored_at)
+            VALUES (:name, :created_at, CURRENT_TIMESTAMP)
+        """
+        )
+        query.bindValue(":name", name)
+        query.bindValue(":created_at", created_at)
+        if not query.exec():
+            raise RestoreError(
+                f"Failed to restore session: {query.lastError().text()}")
+        session_id = query.lastInsertId()
+
+        query = QSqlQuery(self.db)
+        query.prepare(
+            """
+            INSERT INTO transcripts (session_id, text, timestamp)
+            VALUES (:session_id, :text, :timestamp)
+        """
+        )
+        for transcript in self.iter_archived_transcripts(archive_id):
+            query.bindValue(":session_id", session_id)
+            query.bindValue(":text", transcript["text"])
+            query.bindValue(":timestamp", transcript["timestamp"])
+            if not query.exec():
+                raise RestoreError(
+                    f"Failed to restore transcripts: {query.lastError().text()}")
+        if not self._restore_chat(archive_id, session_id):
+            raise RestoreError("Failed to restore the chat history.")
+
+        # Only drop the archive once transcripts and chat are back in place
+        query = QSqlQuery(self.db)
+        query.prepare("DELETE FROM archived_sessions WHERE id = :id")
+        query.bindValue(":id", archive_id)
+        if not query.exec():
+            raise RestoreError(
+                f"Failed to remove the archive: {query.lastError().text()}")
+        return session_id
@@ -0,0 +1,154 @@
+import json
+from datetime import datetime
+
+# Default duration of a subtitle cue when no later transcript bounds it
+DEFAULT_CUE_SECONDS = 3.0
+
+# File dialog filter for each supported export format
+EXPORT_FORMATS = {
+    'txt': 'Text (*.txt)',
+    'srt': 'SubRip Subtitles (*.srt)',
+    'vtt': 'WebVTT Subtitles (*.vtt)',
+    'jsonl': 'JSON Lines (*.jsonl)',
+}
+
+
+def parse_timestamp(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def format_cue_time(seconds, separator):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def iter_cues(rows, time_offset=0.0):
+    """Pair each transcript with start/end offsets (in seconds) from the
+    first transcript of the session, shifted by `time_offset`.
+
+    Transcripts only carry the time they were stored, so cue timings are
+    approximate: a cue ends when the next one starts, and cues that share a
+    timestamp (e.g. file transcriptions) are laid out back to back.
+    Only one row of lookahead is kept, so memory use is constant.
+    """
+    origin = None
+    previous = None
+    previous_start = 0.0
+    last_end = 0.0
+
+    for row in rows:
+        ts = parse_timestamp(row['timestamp'])
+        if origin is None:
+            origin = ts
+        offset = (ts - origin).total_seconds() if ts and origin else None
+
+        if previous is not None:
+            end = offset if offset is not None else previous_start
+            if end <= previous_start:
+                end = previous_start + DEFAULT_CUE_SECONDS
+            yield previous, time_offset + previous_start, time_offset + end
+            last_end = end
+
+        if offset is None or offset < last_end:
+            offset = last_end
+        previous = row
+        previous_start = offset
+
+    if previous is not None:
+        yield (
+            previous,
+            time_offset + previous_start,
+            time_offset + previous_start + DEFAULT_CUE_SECONDS,
+        )
+
+
+class TextExporter:
+    def __init__(self, out):
+        self.out = out
+        self.sessions_written = 0
+
+    def write_session(self, session, rows):
+        if self.sessions_written:
+            self.out.write('\n')
+        self.out.write(f"# {session['name']}\n\n")
+        for row in rows:
+            self.out.write(row['text'])
+            self.out.write('\n')
+        self.sessions_written += 1
+
+
+class SRTExporter:
+    def __init__(self, out):
+        self.out = out
+        self.cue_index = 0
+        # Each session starts after the last cue of the previous one
+        self.time_offset = 0.0
+
+    def write_session(self, session, rows):
+        for row, start, end in iter_cues(rows, self.time_offset):
+            self.time_offset = end
+            self.cue_index += 1
+            self.out.write(
+                f"{self.cue_index}\n"
+                f"{format_cue_time(start, ',')} --> {format_cue_time(end, ',')}\n"
+                f"{row['text']}\n\n"
+            )
+
+
+class VTTExporter:
+    def __init__(self, out):
+        self.out = out
+        self.out.write('WEBVTT\n\n')
+        # Each session starts after the last cue of the previous one
+        self.time_offset = 0.0
+
+    def write_session(self, session, rows):
+        # A NOTE block ends at a blank line and must not contain "-->"
+        name = ' '.join(session['name'].split()).replace('-->', '->')
+        self.out.write(f"NOTE {name}\n\n")
+        for row, start, end in iter_cues(rows, self.time_offset):
+            self.time_offset = end
+            self.out.write(
+                f"{format_cue_time(start, '.')} --> {format_cue_time(end, '.')}\n"
+                f"{row['text']}\n\n"
+            )
+
+
+class JSONLExporter:
+    def __init__(self, out):
+        self.out = out
+
+    def write_session(self, session, rows):
+        for row in rows:
+            record = {
+                'session_id': session['id'],
+                'session': session['name'],
+                'id': row['id'],
+                'text': row['text'],
+                'timestamp': str(row['timestamp']),
+            }
+            self.out.write(json.dumps(record, ensure_ascii=False))
+            self.out.write('\n')
+
+
+EXPORTERS = {
+    'txt': TextExporter,
+    'srt': SRTExporter,
+    'vtt': VTTExporter,
+    'jsonl': JSONLExporter,
+}
+
+
+def create_exporter(fmt, out):
+    try:
+        return EXPORTERS[fmt](out)
+    except KeyError:
+        raise ValueError(f"Unsupported export format: {fmt}") from None
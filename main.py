@@ -1,4 +1,4 @@
-import re
+import os
 import sys
 import threading
 
@@ -9,9 +9,24 @@ from PySide6.QtWidgets import (QApplication, QFileDialog, QInputDialog,
                                QMessageBox)
 from RealtimeSTT import AudioToTextRecorder
 
-from database import Database
-from utils import clean_str, load_ui_widget
-from workers import FileTranscriptionWorker, LLMWorker, TranscriptionWorker
+from database import Database, RestoreError
+from exporters import EXPORT_FORMATS
+from profiling import profiled
+from utils import (accumulate_token, build_llm_messages,
+                   build_summary_messages, clean_str, load_ui_widget,
+                   split_chat_history, split_sentences)
+from workers import (ExportWorker, FileTranscriptionWorker, LLMWorker,
+                     MaintenanceWorker, TranscriptionWorker, count_tokens)
+
+# Sessions without new transcripts for this many days are archived
+RETENTION_DAYS = 180
+# Delay before running database maintenance after startup
+MAINTENANCE_DELAY_MS = 30_000
+# Token budget for the chat turns sent verbatim to the LLM, older turns
+# are folded into a running summary
+CHAT_HISTORY_TOKEN_BUDGET = 1024
+# Maximum length of the running chat summary
+SUMMARY_MAX_TOKENS = 256
 
 
 class MainWindow(QMainWindow):
@@ -47,6 +62,11 @@ class MainWindow(QMainWindow):
         self.transcribe_worker = None
         self.upload_thread = None
         self.upload_worker = None
+        self.export_thread = None
+        self.export_worker = None
+        self.maintenance_thread = None
+        self.maintenance_worker = None
+        self.maintenance_full_vacuum = False
         self.is_recording = False
 
         # Buffer and timer for UI updates
@@ -75,8 +95,16 @@ class MainWindow(QMainWindow):
         self.ui.chatList.itemClicked.connect(self.load_transcript)
 
         # LLM (Large Language Model) chat variables and connections
+        # Chat turns of the current session not yet folded into the summary
         self.llm_messages = []
+        self.llm_summary = None
+        # Session the in-flight LLM response belongs to
+        self.llm_session_id = None
         self.partial_response = ''
+        self.summary_response = ''
+        self.summary_session_id = None
+        self.summary_until = None
+        self.summary_worker_thread = None
         self.ui.summaryButton.clicked.connect(self.summarize)
         self.ui.clearChatButton.clicked.connect(self.clear_chat)
         self.ui.sendButton.clicked.connect(self.send_message)
@@ -86,6 +114,9 @@ class MainWindow(QMainWindow):
         # Load all chat sessions on startup
         self.load_session_list()
 
+        # Run database maintenance in the background once the UI is idle
+        QTimer.singleShot(MAINTENANCE_DELAY_MS, self.run_scheduled_maintenance)
+
     def load_session_list(self):
         """Load all sessions from the database into the list widget"""
         self.ui.chatList.clear()
@@ -121,19 +152,34 @@ class MainWindow(QMainWindow):
             self.load_transcript(items[0])
 
     def show_chat_context_menu(self, position):
-        """Show context menu for renaming or deleting a chat session"""
-        if not self.ui.chatList.currentItem():
-            return
-
+        """Show context menu for managing chat sessions"""
         menu = QMenu()
-        rename_action = QAction("Rename", self)
-        delete_action = QAction("Delete", self)
+        export_all_action = QAction("Export All...", self)
+        restore_action = QAction("Restore Archived...", self)
+        maintenance_action = QAction("Run Maintenance", self)
+
+        export_all_action.triggered.connect(self.export_all_sessions)
+        restore_action.triggered.connect(self.restore_archived_session)
+        maintenance_action.triggered.connect(self.run_full_maintenance)
+
+        if self.ui.chatList.currentItem():
+            rename_action = QAction("Rename", self)
+            delete_action = QAction("Delete", self)
+            export_action = QAction("Export...", self)
+
+            rename_action.triggered.connect(self.rename_current_session)
+            delete_action.triggered.connect(self.delete_current_session)
+            export_action.triggered.connect(self.export_current_session)
 
-        rename_action.triggered.connect(self.rename_current_session)
-        delete_action.triggered.connect(self.delete_current_session)
+            menu.addAction(rename_action)
+            menu.addAction(delete_action)
+            menu.addSeparator()
+            menu.addAction(export_action)
 
-        menu.addAction(rename_action)
-        menu.addAction(delete_action)
+        menu.addAction(export_all_action)
+        menu.addSeparator()
+        menu.addAction(restore_action)
+        menu.addAction(maintenance_action)
 
         menu.exec(self.ui.chatList.mapToGlobal(position))
 
@@ -187,9 +233,211 @@ class MainWindow(QMainWindow):
         if confirm == QMessageBox.Yes:
             self.db.delete_session(session_id)
             self.ui.transcribeContent.clear()
+            self.ui.llmChatList.clear()
+            self.llm_messages = []
+            self.llm_summary = None
             self.current_session_id = None
             self.load_session_list()
 
+    def export_current_session(self):
+        """Export the currently selected chat session to a file"""
+        if not self.ui.chatList.currentItem():
+            return
+
+        current_name = self.ui.chatList.currentItem().text()
+        session_id = self.db.get_session_id_by_name(current_name)
+
+        if not session_id:
+            return
+
+        self.export_sessions([session_id], current_name)
+
+    def export_all_sessions(self):
+        """Export every chat session to a single file"""
+        session_ids = [session["id"] for session in self.db.get_all_sessions()]
+        # Oldest session first
+        session_ids.reverse()
+        if session_ids:
+            self.export_sessions(session_ids, "transcripts")
+
+    def export_sessions(self, session_ids, default_name):
+        """Stream the given sessions to a file in a background thread"""
+        if self.export_thread is not None:
+            QMessageBox.warning(
+                self, "Export in Progress", "Please wait for the current export to finish."
+            )
+            return
+
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            "Export Transcripts",
+            default_name,
+            ";;".join(EXPORT_FORMATS.values()),
+        )
+        if not file_path:
+            return
+
+        # Prefer the file extension, fall back to the selected filter
+        fmt = os.path.splitext(file_path)[1].lstrip(".").lower()
+        if fmt not in EXPORT_FORMATS:
+            fmt = next(
+                (key for key, value in EXPORT_FORMATS.items()
+                 if value == selected_filter),
+                "txt",
+            )
+            file_path += f".{fmt}"
+
+        self.statusBar().showMessage("Export in progress...")
+
+        self.export_thread = QThread()
+        self.export_worker = ExportWorker(
+            self.db.db_path, session_ids, file_path, fmt)
+
+        self.export_worker.moveToThread(self.export_thread)
+        self.export_worker.progress.connect(self.on_export_progress)
+        self.export_worker.export_completed.connect(self.on_export_completed)
+        self.export_worker.export_failed.connect(self.on_export_failed)
+        self.export_thread.started.connect(self.export_worker.run)
+        self.export_worker.finished.connect(self.export_thread.quit)
+        self.export_worker.finished.connect(self.export_worker.deleteLater)
+        self.export_thread.finished.connect(self.export_thread.deleteLater)
+        self.export_thread.finished.connect(self.on_export_thread_finished)
+
+        self.export_thread.start()
+
+    @Slot(int, int)
+    def on_export_progress(self, done, total):
+        """Show export progress in the status bar"""
+        percent = done * 100 // total if total else 100
+        self.statusBar().showMessage(
+            f"Exporting... {percent}% ({done}/{total} lines)")
+
+    @Slot(str)
+    def on_export_completed(self, file_path):
+        """Handle completion of an export"""
+        self.statusBar().showMessage(f"Exported to {file_path}", 5000)
+
+    @Slot(str)
+    def on_export_failed(self, message):
+        """Handle a failed export"""
+        self.statusBar().clearMessage()
+        QMessageBox.critical(self, "Export Failed",
+                             f"Failed to export transcripts:\n{message}")
+
+    @Slot()
+    def on_export_thread_finished(self):
+        """Allow a new export once the export thread has finished"""
+        self.export_thread = None
+        self.export_worker = None
+
+    def run_scheduled_maintenance(self):
+        """Run maintenance unattended, postponing it while recording"""
+        if self.is_recording:
+            QTimer.singleShot(MAINTENANCE_DELAY_MS,
+                              self.run_scheduled_maintenance)
+            return
+        self.run_maintenance()
+
+    def run_full_maintenance(self):
+        """Run maintenance, converting the database to incremental vacuum
+        if needed"""
+        if self.is_recording:
+            QMessageBox.warning(
+                self, "Recording in Progress",
+                "Please stop recording before running maintenance."
+            )
+            return
+        self.run_maintenance(allow_full_vacuum=True)
+
+    def run_maintenance(self, allow_full_vacuum=False):
+        """Purge orphans, archive old sessions and vacuum in the background"""
+        if self.maintenance_thread is not None:
+            return
+
+        self.maintenance_full_vacuum = allow_full_vacuum
+        self.maintenance_thread = QThread()
+        self.maintenance_worker = MaintenanceWorker(
+            self.db.db_path,
+            RETENTION_DAYS,
+            exclude_session_ids=[self.current_session_id],
+            allow_full_vacuum=allow_full_vacuum,
+        )
+
+        self.maintenance_worker.moveToThread(self.maintenance_thread)
+        self.maintenance_worker.progress.connect(self.statusBar().showMessage)
+        self.maintenance_worker.maintenance_completed.connect(
+            self.on_maintenance_completed)
+        self.maintenance_worker.maintenance_failed.connect(
+            self.on_maintenance_failed)
+        self.maintenance_thread.started.connect(self.maintenance_worker.run)
+        self.maintenance_worker.finished.connect(self.maintenance_thread.quit)
+        self.maintenance_worker.finished.connect(
+            self.maintenance_worker.deleteLater)
+        self.maintenance_thread.finished.connect(
+            self.maintenance_thread.deleteLater)
+        self.maintenance_thread.finished.connect(
+            self.on_maintenance_thread_finished)
+
+        self.maintenance_thread.start()
+
+    @Slot(dict)
+    def on_maintenance_completed(self, report):
+        """Report the outcome of database maintenance"""
+        if report["sessions_archived"]:
+            self.load_session_list()
+        self.statusBar().showMessage(
+            f"Maintenance completed: {report['bytes_reclaimed'] / 1024:.1f} KiB reclaimed, "
+            f"{report['sessions_archived']} sessions archived, "
+            f"{report['orphans_purged']} orphaned lines removed."
+            + (" Run Maintenance from the chat list menu to enable space reclamation."
+               if report["full_vacuum_pending"] else ""),
+            10000,
+        )
+
+    @Slot(str)
+    def on_maintenance_failed(self, message):
+        """Report a failed maintenance run"""
+        self.statusBar().showMessage(f"Maintenance failed: {message}", 10000)
+
+    @Slot()
+    def on_maintenance_thread_finished(self):
+        """Allow maintenance to run again once the thread has finished"""
+        self.maintenance_thread = None
+        self.maintenance_worker = None
+        self.maintenance_full_vacuum = False
+
+    def restore_archived_session(self):
+        """Move an archived session back into the chat list"""
+        archived = self.db.get_archived_sessions()
+        if not archived:
+            QMessageBox.information(
+                self, "Restore Archived", "There are no archived sessions.")
+            return
+
+        labels = [
+            f"{session['name']} (archived {session['archived_at']}, "
+            f"{session['transcript_count']} lines)"
+            for session in archived
+        ]
+        label, ok = QInputDialog.getItem(
+            self, "Restore Archived", "Select a session:", labels, 0, False
+        )
+        if not ok:
+            return
+
+        session = archived[labels.index(label)]
+        try:
+            self.db.restore_archived_session(session["id"])
+        except RestoreError as e:
+            QMessageBox.warning(self, "Restore Failed", str(e))
+            return
+
+        self.load_session_list()
+        items = self.ui.chatList.findItems(session["name"], Qt.MatchExactly)
+        if items:
+            self.ui.chatList.setCurrentItem(items[0])
+            self.load_transcript(items[0])
+
     def load_transcript(self, item):
         """Load the transcripts for the selected session"""
         session_name = item.text()
@@ -205,6 +453,32 @@ class MainWindow(QMainWindow):
         for transcript in transcripts:
             self.ui.transcribeContent.addItem(transcript["text"])
 
+        self.load_chat(session_id)
+
+    def load_chat(self, session_id):
+        """Load the stored LLM chat of the selected session"""
+        self.ui.llmChatList.clear()
+        self.llm_summary = self.db.get_chat_summary(session_id)
+        summarized_until = (
+            self.llm_summary["summarized_until"] if self.llm_summary else 0
+        )
+
+        self.llm_messages = []
+        for message in self.db.get_chat_messages(session_id):
+            prefix = "[User]" if message["role"] == "user" else "[Assistant]"
+            self.ui.llmChatList.addItem(f"{prefix} {message['content']}")
+            # Turns already in the summary are only needed for display
+            if message["id"] > summarized_until:
+                self.llm_messages.append(message)
+
+        # Resume showing a response that is still being generated
+        if self.partial_response and self.llm_session_id == session_id:
+            item = QListWidgetItem(f"[Assistant] {self.partial_response}")
+            item.setData(Qt.UserRole, "streaming")
+            self.ui.llmChatList.addItem(item)
+
+        self.ui.llmChatList.scrollToBottom()
+
     def toggle_recording(self):
         """Start or stop audio recording and transcription"""
         if not self.is_recording:
@@ -213,6 +487,13 @@ class MainWindow(QMainWindow):
                     self, "No Chat Selected", "Please create or select a chat first."
                 )
                 return
+            if self.maintenance_full_vacuum:
+                # A full VACUUM locks the database, transcripts could not be saved
+                QMessageBox.warning(
+                    self, "Maintenance in Progress",
+                    "Please wait for database maintenance to finish."
+                )
+                return
             self.start_recording()
         else:
             self.stop_recording()
@@ -279,7 +560,8 @@ class MainWindow(QMainWindow):
             self.ui.transcribeContent.scrollToBottom()
 
             # Save transcript to database
-            self.db.add_transcript(self.current_session_id, s)
+            if self.db.add_transcript(self.current_session_id, s) is None:
+                self.report_transcript_save_failed()
 
     @Slot()
     def flush_update_buffer(self):
@@ -352,17 +634,20 @@ class MainWindow(QMainWindow):
             return
 
         # Split text into sentences for display and storage
-        sentences = re.split(r"(?<=[。！？\.\!?])\s*", text)
-
-        for sent in sentences:
-            sent = sent.strip()
-            if sent:
-                self.ui.transcribeContent.addItem(sent)
-                # Save each sentence to database
-                self.db.add_transcript(self.current_session_id, sent)
+        for sent in split_sentences(text):
+            self.ui.transcribeContent.addItem(sent)
+            # Save each sentence to database
+            if self.db.add_transcript(self.current_session_id, sent) is None:
+                self.report_transcript_save_failed()
+                return
 
         self.statusBar().showMessage("Transcription completed.", 2000)
 
+    def report_transcript_save_failed(self):
+        """Warn that a transcript could not be written to the database"""
+        self.statusBar().showMessage(
+            "Failed to save transcript to the database.", 10000)
+
     @Slot()
     def summarize(self):
         """Send a summarize command to the LLM chat"""
@@ -371,8 +656,11 @@ class MainWindow(QMainWindow):
         self.send_message()
 
     def clear_chat(self):
-        """Clear the LLM chat history"""
+        """Clear the LLM chat history of the current session"""
+        if self.current_session_id:
+            self.db.clear_chat(self.current_session_id)
         self.llm_messages.clear()
+        self.llm_summary = None
         self.ui.llmChatList.clear()
 
     def send_message(self):
@@ -382,11 +670,22 @@ class MainWindow(QMainWindow):
         user_text = self.ui.chatLineEdit.text().strip()
         if user_text == '':
             return
+        if not self.current_session_id:
+            QMessageBox.warning(
+                self, "No Chat Selected", "Please create or select a chat first."
+            )
+            return
 
+        token_count = count_tokens(user_text)
+        message_id = self.db.add_chat_message(
+            self.current_session_id, 'user', user_text, token_count)
         self.llm_messages.append({
+            'id': message_id,
             'role': 'user',
-            'content': user_text
+            'content': user_text,
+            'token_count': token_count
         })
+        self.llm_session_id = self.current_session_id
         # Gather all current transcriptions for context
         current_transcriptions = [
             self.ui.transcribeContent.item(i).text()
@@ -394,26 +693,22 @@ class MainWindow(QMainWindow):
         ]
         transcription_text = "\n".join(current_transcriptions)
         self.ui.chatLineEdit.clear()
+        # Clearing mid-generation would let the reply or summary land in
+        # the cleared chat, so both buttons wait for it to finish
         self.ui.sendButton.setEnabled(False)
+        self.ui.clearChatButton.setEnabled(False)
         self.ui.llmChatList.addItem(f"[User] {user_text}")
         self.ui.llmChatList.scrollToBottom()
 
         # Start LLM worker thread for response generation
         self.llm_worker_thread = QThread()
         self.llm_worker = LLMWorker(
-            messages=[
-                {
-                    'role': 'system',
-                    'content': 'You are an AI assistant helping users with transcriptions. Answer questions, summarize transcripts, and provide helpful suggestions related to audio or text transcriptions.'
-                },
-                {
-                    'role': 'user',
-                    'content': f'''\
-# Transcription
-{transcription_text}
-'''
-                }
-            ] + self.llm_messages)
+            messages=build_llm_messages(
+                transcription_text,
+                self.llm_summary["content"] if self.llm_summary else None,
+                self.llm_messages,
+                CHAT_HISTORY_TOKEN_BUDGET,
+            ))
         self.llm_worker.moveToThread(self.llm_worker_thread)
         self.llm_worker.token_received.connect(self.append_token)
         self.llm_worker.finished.connect(self.query_finished)
@@ -427,20 +722,27 @@ class MainWindow(QMainWindow):
     @Slot(str)
     def append_token(self, token):
         """Append a token from the LLM to the chat UI (streaming output)"""
-        self.partial_response += token
+        self.partial_response, label = accumulate_token(
+            self.partial_response, token)
+
+        # The response belongs to a session that is no longer shown
+        if self.llm_session_id != self.current_session_id:
+            return
 
         scrollbar = self.ui.llmChatList.verticalScrollBar()
         at_bottom = scrollbar.value() == scrollbar.maximum()
 
         # If assistant message not yet shown, add a new item
         if (self.ui.llmChatList.count() == 0 or
-                not self.ui.llmChatList.item(self.ui.llmChatList.count() - 1).data(0).startswith("[Assistant]")):
-            self.ui.llmChatList.addItem(f"[Assistant] {self.partial_response}")
+                self.ui.llmChatList.item(self.ui.llmChatList.count() - 1).data(Qt.UserRole) != "streaming"):
+            item = QListWidgetItem(label)
+            item.setData(Qt.UserRole, "streaming")
+            self.ui.llmChatList.addItem(item)
         else:
             # Update the last item with the current accumulated tokens
             last_item = self.ui.llmChatList.item(
                 self.ui.llmChatList.count() - 1)
-            last_item.setText(f"[Assistant] {self.partial_response}")
+            last_item.setText(label)
 
         if at_bottom:
             self.ui.llmChatList.scrollToBottom()
@@ -448,23 +750,109 @@ class MainWindow(QMainWindow):
     @Slot()
     def query_finished(self):
         """Handle completion of LLM response"""
-        self.llm_messages.append({
-            'role': 'assistant',
-            'content': self.partial_response
-        })
+        session_id = self.llm_session_id
+        token_count = count_tokens(self.partial_response)
+        message_id = self.db.add_chat_message(
+            session_id, 'assistant', self.partial_response, token_count)
+
+        if session_id == self.current_session_id:
+            self.llm_messages.append({
+                'id': message_id,
+                'role': 'assistant',
+                'content': self.partial_response,
+                'token_count': token_count
+            })
+            count = self.ui.llmChatList.count()
+            if count > 0 and self.ui.llmChatList.item(count - 1).data(Qt.UserRole) == "streaming":
+                self.ui.llmChatList.item(count - 1).setData(Qt.UserRole, None)
+
         self.partial_response = ''
+        self.llm_session_id = None
+        if session_id != self.current_session_id or not self.fold_chat_history():
+            self.ui.sendButton.setEnabled(True)
+            self.ui.clearChatButton.setEnabled(True)
+
+    def fold_chat_history(self):
+        """Fold chat turns that no longer fit the token budget into the
+        running summary. Returns True if a summary is being generated."""
+        older, _ = split_chat_history(
+            self.llm_messages, CHAT_HISTORY_TOKEN_BUDGET)
+        if not older:
+            return False
+
+        self.summary_session_id = self.current_session_id
+        self.summary_until = older[-1]['id']
+        self.summary_response = ''
+        self.statusBar().showMessage("Summarizing earlier conversation...")
+
+        self.summary_worker_thread = QThread()
+        self.summary_worker = LLMWorker(
+            messages=build_summary_messages(
+                self.llm_summary['content'] if self.llm_summary else None,
+                older,
+            ),
+            max_tokens=SUMMARY_MAX_TOKENS)
+        self.summary_worker.moveToThread(self.summary_worker_thread)
+        self.summary_worker.token_received.connect(self.append_summary_token)
+        self.summary_worker.finished.connect(self.summary_finished)
+        self.summary_worker_thread.started.connect(self.summary_worker.run)
+        self.summary_worker.finished.connect(self.summary_worker_thread.quit)
+        self.summary_worker.finished.connect(self.summary_worker.deleteLater)
+        self.summary_worker_thread.finished.connect(
+            self.summary_worker_thread.deleteLater)
+        self.summary_worker_thread.start()
+        return True
+
+    @Slot(str)
+    def append_summary_token(self, token):
+        """Accumulate a token of the running chat summary"""
+        self.summary_response += token
+
+    @Slot()
+    def summary_finished(self):
+        """Store the updated running summary of the chat"""
+        content = self.summary_response.strip()
+        # An empty summary keeps the previous one and the unfolded turns,
+        # folding is retried after the next reply
+        saved = bool(content) and self.db.save_chat_summary(
+            self.summary_session_id, content, self.summary_until)
+        if saved and self.summary_session_id == self.current_session_id:
+            self.llm_summary = {
+                'content': content,
+                'summarized_until': self.summary_until
+            }
+            self.llm_messages = [
+                message for message in self.llm_messages
+                if message['id'] > self.summary_until
+            ]
+
+        self.summary_response = ''
+        self.summary_session_id = None
+        self.statusBar().clearMessage()
         self.ui.sendButton.setEnabled(True)
+        self.ui.clearChatButton.setEnabled(True)
 
     def closeEvent(self, event):
         """Handle application close event (cleanup resources)"""
         self.stop_recording()
         self.recorder.shutdown()
         self.update_timer.stop()
+        if self.export_worker:
+            self.export_worker.stop()
+        if self.export_thread:
+            self.export_thread.quit()
+            self.export_thread.wait()
+        if self.maintenance_worker:
+            self.maintenance_worker.stop()
+        if self.maintenance_thread:
+            self.maintenance_thread.quit()
+            self.maintenance_thread.wait()
         if self.llm_worker_thread and hasattr(self.llm_worker_thread, 'stop'):
             self.llm_worker_thread.stop()
         event.accept()
 
 
+@profiled("main")
 def main():
     """Main entry point for the application"""
     app = QApplication(sys.argv)
@@ -0,0 +1,132 @@
+import cProfile
+import functools
+import itertools
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+# Comma separated profilers to enable at runtime: "cpu", "memory" or both
+PROFILE_ENV = "TICKSCRIBE_PROFILE"
+# Comma separated profile names to enable, e.g. "llm_worker,export_worker",
+# or "all". Defaults to every worker but not "main", since only one cProfile
+# can be active at a time on Python 3.12+
+PROFILE_SCOPE_ENV = "TICKSCRIBE_PROFILE_SCOPE"
+# Directory the profiling reports are written to
+PROFILE_DIR_ENV = "TICKSCRIBE_PROFILE_DIR"
+
+# Number of allocation sites listed in memory reports
+MEMORY_TOP_STATS = 25
+
+_report_counter = itertools.count(1)
+
+logger = logging.getLogger(__name__)
+
+# tracemalloc is process-wide while workers run concurrently, so tracing is
+# reference counted and only stopped when the last profiled call ends
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+
+def enabled_profilers():
+    value = os.environ.get(PROFILE_ENV, "")
+    return {name.strip().lower() for name in value.split(",") if name.strip()}
+
+
+def in_profile_scope(name):
+    value = os.environ.get(PROFILE_SCOPE_ENV, "")
+    scope = {item.strip() for item in value.split(",") if item.strip()}
+    if not scope:
+        return name != "main"
+    return "all" in scope or name in scope
+
+
+def _report_path(name, suffix):
+    directory = os.environ.get(PROFILE_DIR_ENV, "profiles")
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(
+        directory, f"{name}-{stamp}-{next(_report_counter)}.{suffix}"
+    )
+
+
+def _start_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_owned = True
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        _tracing_users -= 1
+        # Leave tracing started elsewhere (e.g. -X tracemalloc) running
+        if _tracing_users == 0 and _tracing_owned:
+            tracemalloc.stop()
+            _tracing_owned = False
+
+
+def _write_memory_report(name, snapshot, peak):
+    with open(_report_path(name, "memory.txt"), "w", encoding="utf-8") as out:
+        # Allocations are traced for the whole process, not just this call
+        out.write("Allocations of all threads (process-wide)\n")
+        out.write(f"Peak traced memory: {peak} bytes\n\n")
+        for stat in snapshot.statistics("lineno")[:MEMORY_TOP_STATS]:
+            out.write(f"{stat}\n")
+
+
+def profiled(name):
+    """Profile the decorated function when enabled through TICKSCRIBE_PROFILE
+    and selected by TICKSCRIBE_PROFILE_SCOPE.
+
+    "cpu" writes a cProfile `.prof` file (readable with pstats or snakeviz)
+    and "memory" writes the top tracemalloc allocation sites. cProfile only
+    sees the calling thread, so worker `run` methods are decorated
+    separately. tracemalloc covers the whole process, so memory reports
+    include allocations of every thread running at the time. When disabled
+    the function is called directly.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profilers = enabled_profilers()
+            if not profilers or not in_profile_scope(name):
+                return func(*args, **kwargs)
+
+            trace_memory = "memory" in profilers
+            if trace_memory:
+                _start_tracing()
+            profiler = None
+            if "cpu" in profilers:
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Python 3.12+ allows a single active profiler per
+                    # process, leave this call to the one already running
+                    logger.warning(
+                        "Skipping CPU profile of %s, another profiler is "
+                        "active; narrow %s to a single scope",
+                        name, PROFILE_SCOPE_ENV)
+                    profiler = None
+
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    profiler.dump_stats(_report_path(name, "prof"))
+                if trace_memory:
+                    try:
+                        _, peak = tracemalloc.get_traced_memory()
+                        _write_memory_report(
+                            name, tracemalloc.take_snapshot(), peak)
+                    finally:
+                        _stop_tracing()
+        return wrapper
+    return decorator
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# Make the application modules importable when running plain `pytest`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def qt_app():
+    QtCore = pytest.importorskip("PySide6.QtCore")
+    # The SQL driver plugins are loaded through the application instance,
+    # which must outlive every connection
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+@pytest.fixture
+def db(qt_app, tmp_path):
+    from database import Database
+
+    db = Database(str(tmp_path / "transcripts.db"), connection_name="test")
+    yield db
+    db.close()
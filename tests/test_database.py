@@ -0,0 +1,134 @@
+import pytest
+
+
+@pytest.fixture
+def session_id(db):
+    session_id = db.create_session("meeting")
+    for i in range(5):
+        db.add_transcript(session_id, f"line {i}")
+    return session_id
+
+
+def test_export_read_does_not_block_writes(db, session_id):
+    from database import Database
+
+    reader = Database(db.db_path, connection_name="reader")
+    try:
+        rows = reader.iter_transcripts(session_id)
+        next(rows)
+        # An open read on another connection must not block inserts
+        assert db.add_transcript(session_id, "live") is not None
+        rows.close()
+    finally:
+        reader.close()
+    assert db.count_transcripts(session_id) == 6
+
+
+def make_expired(db, session_id):
+    from PySide6.QtSql import QSqlQuery
+
+    query = QSqlQuery(db.db)
+    query.exec("UPDATE sessions SET created_at = '2020-01-01 00:00:00'")
+    query.exec("UPDATE transcripts SET timestamp = '2020-01-01 00:00:00'")
+
+
+def test_delete_session_cascades(db, session_id):
+    db.delete_session(session_id)
+    assert db.count_transcripts(session_id) == 0
+    assert db.purge_orphaned_transcripts() == 0
+
+
+def test_expired_sessions(db, session_id):
+    assert db.get_expired_session_ids(180) == []
+    make_expired(db, session_id)
+    assert db.get_expired_session_ids(180) == [session_id]
+
+
+def test_archive_restore_round_trip(db, session_id):
+    make_expired(db, session_id)
+    original = db.get_transcripts_by_session_id(session_id)
+
+    archive_id = db.archive_session(session_id)
+    assert archive_id is not None
+    assert db.get_session_id_by_name("meeting") is None
+    assert db.count_transcripts(session_id) == 0
+    [archived] = db.get_archived_sessions()
+    assert archived["transcript_count"] == 5
+
+    restored_id = db.restore_archived_session(archive_id)
+    restored = db.get_transcripts_by_session_id(restored_id)
+    assert [(t["text"], t["timestamp"]) for t in restored] == [
+        (t["text"], t["timestamp"]) for t in original]
+    assert db.get_archived_sessions() == []
+    # A restored session is not archived again on the next run
+    assert db.get_expired_session_ids(180) == []
+
+
+def test_restore_name_conflict_keeps_archive(db, session_id):
+    from database import RestoreError
+
+    archive_id = db.archive_session(session_id)
+    db.create_session("meeting")
+    with pytest.raises(RestoreError, match="already exists"):
+        db.restore_archived_session(archive_id)
+    assert len(db.get_archived_sessions()) == 1
+
+
+def test_restore_corrupt_archive_keeps_archive(db, session_id):
+    from PySide6.QtCore import QByteArray
+    from PySide6.QtSql import QSqlQuery
+
+    from database import RestoreError
+
+    archive_id = db.archive_session(session_id)
+    query = QSqlQuery(db.db)
+    query.prepare("UPDATE archived_sessions SET data = :data")
+    query.bindValue(":data", QByteArray(b"not zlib"))
+    query.exec()
+
+    with pytest.raises(RestoreError, match="corrupt"):
+        db.restore_archived_session(archive_id)
+    assert len(db.get_archived_sessions()) == 1
+    assert db.get_session_id_by_name("meeting") is None
+
+
+def test_incremental_vacuum_frees_all_pages(db, session_id):
+    db.db.transaction()
+    for i in range(3000):
+        db.add_transcript(session_id, "x" * 200)
+    db.db.commit()
+    db.delete_session(session_id)
+    assert db._pragma_value("freelist_count") > 0
+
+    db.incremental_vacuum()
+    assert db._pragma_value("freelist_count") == 0
+
+
+def test_archive_restore_keeps_chat(db, session_id):
+    ids = [
+        db.add_chat_message(session_id, role, content, 3)
+        for role, content in [
+            ("user", "q1"), ("assistant", "a1"), ("user", "q2")]
+    ]
+    db.save_chat_summary(session_id, "summary", ids[1])
+
+    archive_id = db.archive_session(session_id)
+    assert db.get_chat_messages(session_id) == []
+    assert db.get_chat_summary(session_id) is None
+
+    restored_id = db.restore_archived_session(archive_id)
+    messages = db.get_chat_messages(restored_id)
+    assert [(m["role"], m["content"]) for m in messages] == [
+        ("user", "q1"), ("assistant", "a1"), ("user", "q2")]
+    # The summary boundary follows the re-inserted message ids
+    summary = db.get_chat_summary(restored_id)
+    assert summary["content"] == "summary"
+    assert summary["summarized_until"] == messages[1]["id"]
+
+
+def test_clear_chat(db, session_id):
+    message_id = db.add_chat_message(session_id, "user", "q", 1)
+    db.save_chat_summary(session_id, "summary", message_id)
+    db.clear_chat(session_id)
+    assert db.get_chat_messages(session_id) == []
+    assert db.get_chat_summary(session_id) is None
@@ -0,0 +1,47 @@
+import io
+
+from exporters import create_exporter, iter_cues
+
+ROWS = [
+    {'id': 1, 'text': 'first', 'timestamp': '2024-01-01 10:00:00'},
+    {'id': 2, 'text': 'second', 'timestamp': '2024-01-01 10:00:00'},
+    {'id': 3, 'text': 'third', 'timestamp': '2024-01-01 10:00:10'},
+]
+
+
+def test_iter_cues_is_monotonic():
+    cues = [(row['id'], start, end) for row, start, end in iter_cues(ROWS)]
+    # Rows sharing a timestamp are laid out back to back
+    assert cues == [(1, 0.0, 3.0), (2, 3.0, 10.0), (3, 10.0, 13.0)]
+
+
+def test_iter_cues_without_timestamps():
+    rows = [{'id': i, 'text': 'x', 'timestamp': None} for i in range(3)]
+    starts = [start for _, start, _ in iter_cues(rows)]
+    assert starts == [0.0, 3.0, 6.0]
+
+
+def test_iter_cues_offset():
+    cues = list(iter_cues(ROWS, time_offset=100.0))
+    assert cues[0][1] == 100.0
+    assert cues[-1][2] == 113.0
+
+
+def test_srt_sessions_continue_timeline():
+    out = io.StringIO()
+    exporter = create_exporter('srt', out)
+    exporter.write_session({'id': 1, 'name': 'a'}, iter(ROWS))
+    exporter.write_session({'id': 2, 'name': 'b'}, iter(ROWS))
+
+    blocks = out.getvalue().strip().split('\n\n')
+    assert [block.split('\n')[0] for block in blocks] == [
+        '1', '2', '3', '4', '5', '6']
+    assert blocks[3].split('\n')[1] == '00:00:13,000 --> 00:00:16,000'
+
+
+def test_vtt_note_is_sanitized():
+    out = io.StringIO()
+    exporter = create_exporter('vtt', out)
+    exporter.write_session({'id': 1, 'name': 'a --> b\nc'}, iter(ROWS[:1]))
+    assert 'NOTE a -> b c\n\n' in out.getvalue()
+    assert out.getvalue().count('-->') == 1
@@ -0,0 +1,42 @@
+import threading
+import tracemalloc
+
+from profiling import profiled
+
+
+def test_memory_tracing_outlives_concurrent_workers(tmp_path, monkeypatch):
+    monkeypatch.setenv("TICKSCRIBE_PROFILE", "memory")
+    monkeypatch.setenv("TICKSCRIBE_PROFILE_DIR", str(tmp_path))
+    first_done = threading.Event()
+    second_started = threading.Event()
+
+    @profiled("first_worker")
+    def first():
+        second_started.wait()
+
+    @profiled("second_worker")
+    def second():
+        second_started.set()
+        # Tracing must keep running after the first worker finished
+        first_done.wait()
+        assert tracemalloc.is_tracing()
+
+    threads = [threading.Thread(target=second), threading.Thread(target=first)]
+    for thread in threads:
+        thread.start()
+    threads[1].join()
+    first_done.set()
+    threads[0].join()
+
+    reports = sorted(path.name.split("-")[0] for path in tmp_path.iterdir())
+    assert reports == ["first_worker", "second_worker"]
+    assert not tracemalloc.is_tracing()
+
+
+def test_main_not_profiled_by_default(tmp_path, monkeypatch):
+    monkeypatch.setenv("TICKSCRIBE_PROFILE", "cpu")
+    monkeypatch.setenv("TICKSCRIBE_PROFILE_DIR", str(tmp_path))
+    monkeypatch.delenv("TICKSCRIBE_PROFILE_SCOPE", raising=False)
+
+    profiled("main")(lambda: None)()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,78 @@
+import pytest
+
+pytest.importorskip("PySide6")
+
+from utils import (SYSTEM_PROMPT, build_llm_messages,  # noqa: E402
+                   build_summary_messages, split_chat_history)
+
+
+def message(role, tokens, content=None):
+    return {
+        'role': role,
+        'content': content or f'{role} {tokens}',
+        'token_count': tokens,
+    }
+
+
+CHAT = [
+    message('user', 5),
+    message('assistant', 50),
+    message('user', 5),
+    message('assistant', 30),
+    message('user', 4),
+]
+
+
+def test_split_chat_history_fits_budget():
+    older, recent = split_chat_history(CHAT, 80)
+    assert older == CHAT[:2]
+    assert recent == CHAT[2:]
+    assert sum(m['token_count'] for m in recent) <= 80
+
+
+def test_split_chat_history_keeps_everything_within_budget():
+    assert split_chat_history(CHAT, 1000) == ([], CHAT)
+
+
+def test_split_chat_history_always_keeps_latest_message():
+    older, recent = split_chat_history(CHAT, 0)
+    assert recent == CHAT[-1:]
+    assert older == CHAT[:-1]
+
+
+def test_split_chat_history_recent_starts_with_user():
+    # 34 tokens fit the last two messages, but an assistant reply may not
+    # open the recent window
+    older, recent = split_chat_history(CHAT, 34)
+    assert recent == CHAT[-1:]
+    assert recent[0]['role'] == 'user'
+
+
+def test_split_chat_history_empty():
+    assert split_chat_history([], 10) == ([], [])
+
+
+def test_build_llm_messages():
+    messages = build_llm_messages('hello world', 'earlier', CHAT, 80)
+    assert messages[0] == {'role': 'system', 'content': SYSTEM_PROMPT}
+    assert messages[1]['role'] == 'user'
+    assert 'hello world' in messages[1]['content']
+    assert messages[2] == {
+        'role': 'system',
+        'content': 'Summary of the earlier conversation:\nearlier',
+    }
+    # Only the recent turns, without bookkeeping keys
+    assert messages[3:] == [
+        {'role': m['role'], 'content': m['content']} for m in CHAT[2:]]
+
+
+def test_build_llm_messages_without_summary():
+    messages = build_llm_messages('', None, CHAT[-1:], 80)
+    assert [m['role'] for m in messages] == ['system', 'user', 'user']
+
+
+def test_build_summary_messages():
+    messages = build_summary_messages(None, CHAT[:2])
+    content = messages[1]['content']
+    assert '(empty)' in content
+    assert 'User: user 5\nAssistant: assistant 50' in content
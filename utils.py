@@ -1,4 +1,6 @@
 
+import re
+
 from PySide6.QtCore import QFile
 from PySide6.QtUiTools import QUiLoader
 from PySide6.QtWidgets import QWidget
@@ -32,3 +34,103 @@ def clean_str(s):
         else:
             processed_words.append(word)
     return ' '.join(processed_words)
+
+
+# Sentence boundaries for both CJK and Latin punctuation
+SENTENCE_END_RE = re.compile(r"(?<=[。！？\.\!?])\s*")
+
+
+def split_sentences(text):
+    """Split text into non-empty, stripped sentences"""
+    sentences = []
+    for sent in SENTENCE_END_RE.split(text):
+        sent = sent.strip()
+        if sent:
+            sentences.append(sent)
+    return sentences
+
+
+def accumulate_token(partial_response, token):
+    """Append a streamed token, returning the response and its chat label"""
+    partial_response += token
+    return partial_response, f"[Assistant] {partial_response}"
+
+
+def split_chat_history(messages, token_budget):
+    """Split chat messages into (older, recent) so that the recent turns fit
+    in `token_budget` tokens.
+
+    Each message needs a 'token_count'. The latest message is always kept
+    in `recent`, and `recent` never starts with an assistant reply.
+    """
+    total = 0
+    start = len(messages)
+    while start > 0:
+        tokens = messages[start - 1]['token_count']
+        if start < len(messages) and total + tokens > token_budget:
+            break
+        total += tokens
+        start -= 1
+    while start < len(messages) - 1 and messages[start]['role'] != 'user':
+        start += 1
+    return messages[:start], messages[start:]
+
+
+SYSTEM_PROMPT = 'You are an AI assistant helping users with transcriptions. Answer questions, summarize transcripts, and provide helpful suggestions related to audio or text transcriptions.'
+SUMMARY_PROMPT = 'You maintain a concise running summary of a conversation between a user and an AI assistant about a transcription. Merge the new conversation turns into the current summary, keeping facts, decisions and open questions. Reply with the updated summary only.'
+
+
+def build_llm_messages(transcription_text, summary, messages, token_budget):
+    """Assemble the prompt messages for the LLM.
+
+    Only the most recent chat turns that fit in `token_budget` are sent
+    verbatim; earlier turns are represented by the running `summary`.
+    """
+    llm_messages = [
+        {
+            'role': 'system',
+            'content': SYSTEM_PROMPT
+        },
+        {
+            'role': 'user',
+            'content': f'''\
+# Transcription
+{transcription_text}
+'''
+        }
+    ]
+    if summary:
+        llm_messages.append({
+            'role': 'system',
+            'content': f'Summary of the earlier conversation:\n{summary}'
+        })
+    _, recent = split_chat_history(messages, token_budget)
+    llm_messages += [
+        {'role': message['role'], 'content': message['content']}
+        for message in recent
+    ]
+    return llm_messages
+
+
+def build_summary_messages(summary, messages):
+    """Assemble the prompt that folds `messages` into the running summary"""
+    turns = "\n".join(
+        f"{message['role'].capitalize()}: {message['content']}"
+        for message in messages
+    )
+    return [
+        {
+            'role': 'system',
+            'content': SUMMARY_PROMPT
+        },
+        {
+            'role': 'user',
+            'content': f'''\
+# Current summary
+{summary or '(empty)'}
+
+# New conversation turns
+{turns}
+'''
+        }
+    ]
@@ -1,8 +1,13 @@
+import os
+
 import mlx_whisper
 from mlx_lm import load, stream_generate
 from PySide6.QtCore import QObject, Signal, Slot
 from RealtimeSTT import AudioToTextRecorder
 
+from database import Database
+from exporters import create_exporter
+from profiling import profiled
 from utils import clean_str
 
 # Worker for real-time transcription from audio input
@@ -19,6 +24,7 @@ class TranscriptionWorker(QObject):
         self._running = True
 
     @Slot()
+    @profiled("transcription_worker")
     def run(self):
         # Continuously check for new transcribed text while running
         while self._running and not self.recorder.is_shut_down:
@@ -45,6 +51,7 @@ class FileTranscriptionWorker(QObject):
         self.file_path = file_path
 
     @Slot()
+    @profiled("file_transcription_worker")
     def run(self):
         # Transcribe the audio file using mlx_whisper
         result = mlx_whisper.transcribe(
@@ -56,9 +63,174 @@ class FileTranscriptionWorker(QObject):
         self.finished.emit()                     # Emit finished signal
 
 
+# Worker for exporting sessions to a file
+
+
+class ExportWorker(QObject):
+    # Signal emitted with (rows written, total rows)
+    progress = Signal(int, int)
+    export_completed = Signal(str)     # Signal emitted with the output path
+    export_failed = Signal(str)        # Signal emitted with an error message
+    finished = Signal()                # Signal emitted when the worker finishes
+
+    # Number of rows between progress updates
+    PROGRESS_INTERVAL = 1000
+
+    def __init__(self, db_path, session_ids, file_path, fmt):
+        super().__init__()
+        self.db_path = db_path
+        self.session_ids = session_ids
+        self.file_path = file_path
+        self.fmt = fmt
+        self._abort = False
+
+    def _count_rows(self, rows):
+        # Report progress as rows stream from the database to the file
+        for row in rows:
+            if self._abort:
+                raise InterruptedError("Export cancelled")
+            yield row
+            self.rows_written += 1
+            if self.rows_written % self.PROGRESS_INTERVAL == 0:
+                self.progress.emit(self.rows_written, self.total_rows)
+
+    @Slot()
+    @profiled("export_worker")
+    def run(self):
+        db = None
+        partial_path = f"{self.file_path}.part"
+        self.rows_written = 0
+        try:
+            # Use a dedicated connection, the main one belongs to the GUI thread
+            db = Database(self.db_path, connection_name=f"export-{id(self)}")
+            self.total_rows = sum(
+                db.count_transcripts(session_id)
+                for session_id in self.session_ids
+            )
+            self.progress.emit(0, self.total_rows)
+            # Write next to the target and rename once complete, so a failed
+            # or cancelled export never leaves a truncated file behind
+            with open(partial_path, 'w', encoding='utf-8') as out:
+                exporter = create_exporter(self.fmt, out)
+                for session_id in self.session_ids:
+                    session = {
+                        'id': session_id,
+                        'name': db.get_session_name_by_id(session_id),
+                    }
+                    exporter.write_session(
+                        session,
+                        self._count_rows(db.iter_transcripts(session_id))
+                    )
+            os.replace(partial_path, self.file_path)
+            self.progress.emit(self.rows_written, self.total_rows)
+            self.export_completed.emit(self.file_path)
+        except Exception as e:
+            try:
+                os.remove(partial_path)
+            except OSError:
+                pass
+            # Report any failure, the GUI waits for finished either way
+            self.export_failed.emit(str(e))
+        finally:
+            if db is not None:
+                db.close()
+            self.finished.emit()
+
+    def stop(self):
+        self._abort = True  # Abort the export before the next row
+
+
+# Worker for database maintenance (orphan cleanup, archival, vacuum)
+
+
+class MaintenanceWorker(QObject):
+    # Signal emitted with a short description of the current step
+    progress = Signal(str)
+    # Signal emitted with the maintenance report
+    maintenance_completed = Signal(dict)
+    maintenance_failed = Signal(str)   # Signal emitted with an error message
+    finished = Signal()          # Signal emitted when the worker finishes
+
+    def __init__(self, db_path, retention_days, exclude_session_ids=(),
+                 allow_full_vacuum=False):
+        super().__init__()
+        self.db_path = db_path
+        self.retention_days = retention_days
+        # Sessions that must not be archived, e.g. the one currently open
+        self.exclude_session_ids = set(exclude_session_ids)
+        # The one-time conversion to incremental auto-vacuum rewrites the
+        # whole database under an exclusive lock, so it is opt-in
+        self.allow_full_vacuum = allow_full_vacuum
+        self._abort = False
+
+    @Slot()
+    @profiled("maintenance_worker")
+    def run(self):
+        db = None
+        report = {
+            'orphans_purged': 0,
+            'sessions_archived': 0,
+            'full_vacuum': False,
+            'full_vacuum_pending': False,
+        }
+        try:
+            report['bytes_before'] = os.path.getsize(self.db_path)
+            # Use a dedicated connection, the main one belongs to the GUI thread
+            db = Database(
+                self.db_path, connection_name=f"maintenance-{id(self)}")
+
+            self.progress.emit("Purging orphaned transcripts...")
+            report['orphans_purged'] = db.purge_orphaned_transcripts()
+
+            if self.retention_days:
+                self.progress.emit("Archiving old sessions...")
+                for session_id in db.get_expired_session_ids(self.retention_days):
+                    if self._abort:
+                        break
+                    if session_id in self.exclude_session_ids:
+                        continue
+                    if db.archive_session(session_id) is not None:
+                        report['sessions_archived'] += 1
+
+            if not self._abort:
+                self.progress.emit("Reclaiming free space...")
+                if db.is_incremental_vacuum_enabled():
+                    db.incremental_vacuum()
+                elif self.allow_full_vacuum:
+                    # Switching an existing database to incremental
+                    # auto-vacuum needs a one-time full VACUUM
+                    report['full_vacuum'] = db.enable_incremental_vacuum()
+                else:
+                    report['full_vacuum_pending'] = True
+
+                self.progress.emit("Updating query statistics...")
+                db.analyze()
+
+            db.close()
+            db = None
+            report['bytes_after'] = os.path.getsize(self.db_path)
+            report['bytes_reclaimed'] = max(
+                report['bytes_before'] - report['bytes_after'], 0)
+            self.maintenance_completed.emit(report)
+        except Exception as e:
+            # Report any failure, the GUI waits for finished either way
+            self.maintenance_failed.emit(str(e))
+        finally:
+            if db is not None:
+                db.close()
+            self.finished.emit()
+
+    def stop(self):
+        self._abort = True  # Skip the remaining maintenance steps
+
+
 # Load the LLM model and tokenizer
 model, tokenizer = load("mlx-community/Llama-3.2-1B-Instruct-4bit")
 
+
+def count_tokens(text):
+    return len(tokenizer.encode(text))
+
 # Worker for generating responses from a language model
 
 
@@ -66,12 +238,14 @@ class LLMWorker(QObject):
     token_received = Signal(str)  # Signal emitted for each generated token
     finished = Signal()           # Signal emitted when generation is finished
 
-    def __init__(self, messages):
+    def __init__(self, messages, max_tokens=2048):
         super().__init__()
         self.messages = messages
+        self.max_tokens = max_tokens
         self._abort = False
 
     @Slot()
+    @profiled("llm_worker")
     def run(self):
         # Prepare the prompt using the chat template if available
         if tokenizer.chat_template is not None:
@@ -81,7 +255,7 @@ class LLMWorker(QObject):
             )
 
         # Stream generated tokens and emit them one by one
-        for response in stream_generate(model, tokenizer, prompt, max_tokens=2048):
+        for response in stream_generate(model, tokenizer, prompt, max_tokens=self.max_tokens):
             self.token_received.emit(response.text)
 
         self.finished.emit()  # Emit finished signal when done